@@ -0,0 +1,118 @@
+"""Propagation kernel of the Sudoku solver.
+
+The logical elimination of sudoku_puzzle_solver.py (implement_horizontal(),
+implement_vertical() and sectors()) and the board copies and square choice of
+its DFS (guess(), backtrack() and find_shortest_list()) spend most of the
+solving time in loops over single squares. This module contains the same
+loops written against an explicitly passed board and with type annotations,
+so that it can be compiled into a C extension with mypyc:
+
+    pip install mypy
+    mypyc sudoku_kernel.py
+
+which places sudoku_kernel.<platform>.so next to this file. Python imports the
+extension instead of this file when both are present. sudoku_puzzle_solver.py
+only uses the kernel when it has been compiled; otherwise it runs its own
+pure-Python functions. Either way the results must be identical, down to the
+amount of guesses, which check_kernel_parity() in sudoku_puzzle_solver.py
+verifies.
+
+A board is a list of 9 lists (rows) of 9 candidate masks, like matrix in
+sudoku_puzzle_solver.py.
+"""
+
+from typing import Final, List, Tuple
+
+# CANDIDATE_COUNT[mask] is the amount of candidates in mask.
+CANDIDATE_COUNT: Final = [bin(mask).count('1') for mask in range(512)]
+
+# The squares of the 9 sectors in the order in which sectors() of
+# sudoku_puzzle_solver.py visits them: SECTOR_SQUARES[sector] is a list of
+# (x, y) pairs.
+SECTOR_SQUARES: Final = [[(x, y) for x in range(x0, x0 + 3)
+                          for y in range(y0, y0 + 3)]
+                         for x0 in range(0, 9, 3) for y0 in range(0, 9, 3)]
+
+
+def eliminate_rows(board: List[List[int]]) -> int:
+    """Same as implement_horizontal() without tracing."""
+    counter = 0
+    for y in range(9):
+        row = board[y]
+        for x in range(9):
+            remove = row[x]
+            if CANDIDATE_COUNT[remove] != 1:
+                continue
+            for x2 in range(9):
+                if x2 != x and row[x2] & remove:
+                    row[x2] &= ~remove
+                    counter += 1
+                    if CANDIDATE_COUNT[row[x2]] == 1:
+                        break
+    return counter
+
+
+def eliminate_columns(board: List[List[int]]) -> int:
+    """Same as implement_vertical() without tracing."""
+    counter = 0
+    for x in range(9):
+        for y in range(9):
+            remove = board[y][x]
+            if CANDIDATE_COUNT[remove] != 1:
+                continue
+            for y2 in range(9):
+                row = board[y2]
+                if y2 != y and row[x] & remove:
+                    row[x] &= ~remove
+                    counter += 1
+                    if CANDIDATE_COUNT[row[x]] == 1:
+                        break
+    return counter
+
+
+def eliminate_sectors(board: List[List[int]]) -> int:
+    """Same as sectors() without tracing.
+
+    Like sectors(), this returns as soon as a square gets solved.
+    """
+    counter = 0
+    for sector in SECTOR_SQUARES:
+        for x, y in sector:
+            remove = board[y][x]
+            if CANDIDATE_COUNT[remove] != 1:
+                continue
+            for x2, y2 in sector:
+                row = board[y2]
+                if row[x2] & remove and (x2 != x or y2 != y):
+                    row[x2] &= ~remove
+                    counter += 1
+                    if CANDIDATE_COUNT[row[x2]] == 1:
+                        return counter
+    return counter
+
+
+def copy_board(source: List[List[int]], target: List[List[int]]) -> None:
+    """Copies the masks of source into the rows of target in place."""
+    for y in range(9):
+        source_row = source[y]
+        target_row = target[y]
+        for x in range(9):
+            target_row[x] = source_row[x]
+
+
+def shortest_square(board: List[List[int]]) -> Tuple[int, int]:
+    """Same as find_shortest_list(), but returns (-1, -1) instead of None."""
+    shortest = 10
+    found_x = -1
+    found_y = -1
+    for y in range(9):
+        row = board[y]
+        for x in range(9):
+            count = CANDIDATE_COUNT[row[x]]
+            if count != 1 and count < shortest:
+                shortest = count
+                found_x = x
+                found_y = y
+                if shortest == 0:
+                    return found_x, found_y
+    return found_x, found_y
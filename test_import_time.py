@@ -0,0 +1,43 @@
+"""Regression test for the startup of sudoku_puzzle_solver.
+
+Batch workers and command line runs import the solver over and over, so the
+import must stay within IMPORT_TIME_BUDGET and must not pull in the modules
+which only some parts need (LAZY_MODULES). Run with
+
+    python -m unittest test_import_time
+
+or with pytest.
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+from sudoku_puzzle_solver import (IMPORT_TIME_BUDGET, LAZY_MODULES,
+                                  measure_import_time)
+
+
+class ImportTimeTest(unittest.TestCase):
+
+    def test_import_within_budget(self):
+        seconds, _ = measure_import_time(runs=5)
+        self.assertIsNotNone(seconds, 'no -X importtime output')
+        self.assertLessEqual(seconds, IMPORT_TIME_BUDGET,
+                             'import took %.3f sec' % seconds)
+
+    def test_lazy_modules_not_imported(self):
+        # A fresh interpreter, as this one has imported the solver and
+        # unittest already.
+        completed = subprocess.run(
+            [sys.executable, '-c',
+             'import sys, sudoku_puzzle_solver\n'
+             'print(" ".join(sorted(set(sys.modules) & set(%r))))'
+             % (LAZY_MODULES,)],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.PIPE, universal_newlines=True, check=True)
+        self.assertEqual(completed.stdout.split(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()